@@ -98,6 +98,87 @@ def render_object(obj, size: int, **kwargs):
 
 render_object.cache = {}
 
+def bitboards_to_array(*bitboards: int) -> np.ndarray:
+    # One row of 64 booleans per bitboard, indexed by square
+    as_bytes = np.array(bitboards, dtype = "<u8").view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis = 1, bitorder = "little").astype(bool)
+
+def generate_rays():
+    # rays[direction, square] lists the squares walked from square, padded with 64
+    directions = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+    rays = np.full((len(directions), 64, 7), 64, dtype = np.intp)
+    for d, (file_step, rank_step) in enumerate(directions):
+        for square in chess.SQUARES:
+            file, rank = chess.square_file(square) + file_step, chess.square_rank(square) + rank_step
+            k = 0
+            while 0 <= file < 8 and 0 <= rank < 8:
+                rays[d, square, k] = chess.square(file, rank)
+                file, rank, k = file + file_step, rank + rank_step, k + 1
+    return rays
+
+RAYS = generate_rays()
+ORTHOGONAL_DIRECTIONS = slice(0, 4)
+DIAGONAL_DIRECTIONS = slice(4, 8)
+KNIGHT_ATTACKS = bitboards_to_array(*chess.BB_KNIGHT_ATTACKS).astype(np.int32)
+KING_ATTACKS = bitboards_to_array(*chess.BB_KING_ATTACKS).astype(np.int32)
+PAWN_ATTACKS = np.stack([bitboards_to_array(*chess.BB_PAWN_ATTACKS[color]) for color in chess.COLORS[::-1]]).astype(np.int32)
+
+def sliding_attacks(occupied: np.ndarray, directions: slice) -> np.ndarray:
+    # occupied is padded to 65 squares so that the ray padding never blocks
+    rays = RAYS[directions]
+    blockers = occupied[rays]
+    reachable = ((np.cumsum(blockers, axis = -1) - blockers) == 0) & (rays != 64)
+    sources = np.broadcast_to(np.arange(64)[None, :, None], rays.shape)
+    attacks = np.zeros((64, 65), dtype = np.int32)
+    attacks[sources[reachable], rays[reachable]] = 1
+    return attacks[:, :64]
+
+def attack_maps(board: chess.Board):
+    """Returns the attacker counts indexed by [color, square] and the masks of hanging and pinned pieces."""
+    white, black, pawns, knights, bishops, rooks, queens, kings = bitboards_to_array(
+        board.occupied_co[chess.WHITE],
+        board.occupied_co[chess.BLACK],
+        board.pawns,
+        board.knights,
+        board.bishops,
+        board.rooks,
+        board.queens,
+        board.kings,
+    )
+    occupied = np.append(white | black, False)
+    diagonal_attacks = sliding_attacks(occupied, DIAGONAL_DIRECTIONS)
+    orthogonal_attacks = sliding_attacks(occupied, ORTHOGONAL_DIRECTIONS)
+
+    counts = np.zeros((2, 64), dtype = np.int32)
+    for color, pieces in ((chess.BLACK, black), (chess.WHITE, white)):
+        counts[int(color)] = (
+            (pawns & pieces) @ PAWN_ATTACKS[int(color)]
+            + (knights & pieces) @ KNIGHT_ATTACKS
+            + ((bishops | queens) & pieces) @ diagonal_attacks
+            + ((rooks | queens) & pieces) @ orthogonal_attacks
+            + (kings & pieces) @ KING_ATTACKS
+        )
+
+    hanging = ((white & (counts[0] > 0) & (counts[1] == 0)) | (black & (counts[1] > 0) & (counts[0] == 0))) & ~kings
+
+    pinned = np.zeros(65, dtype = bool)
+    for own, enemy in ((white, black), (black, white)):
+        king_squares = np.flatnonzero(kings & own)
+        if len(king_squares) != 1:
+            continue
+        sliders = np.zeros((len(RAYS), 65), dtype = bool)
+        sliders[ORTHOGONAL_DIRECTIONS, :64] = (rooks | queens) & enemy
+        sliders[DIAGONAL_DIRECTIONS, :64] = (bishops | queens) & enemy
+        rays = RAYS[:, king_squares[0]]
+        blockers = occupied[rays]
+        seen = np.cumsum(blockers, axis = -1)
+        first = rays[np.arange(len(rays)), np.argmax(blockers & (seen == 1), axis = -1)]
+        second = rays[np.arange(len(rays)), np.argmax(blockers & (seen == 2), axis = -1)]
+        is_pin = (seen[:, -1] >= 2) & np.append(own, False)[first] & sliders[np.arange(len(rays)), second]
+        pinned[first[is_pin]] = True
+
+    return counts, hanging, pinned[:64]
+
 class EventHandler:
 
     def __init__(self, chess_gui):
@@ -184,6 +265,10 @@ class EventHandler:
         self.chess_gui.ORIENTATION = not self.chess_gui.ORIENTATION
         self.chess_gui.update_board_blit()
 
+    def h_key_down(self):
+        self.chess_gui.show_attack_overlay = not self.chess_gui.show_attack_overlay
+        self.chess_gui.update_board_blit()
+
     def space_key_down(self):
         engine = self.chess_gui.white_engine if self.chess_gui.board.turn else self.chess_gui.black_engine
         if engine is None:
@@ -228,6 +313,13 @@ class ChessGUI:
         self.ORIENTATION = chess.WHITE
         self.HIGHLIGHT_SQUARES_COLOR_DARK = "#ff0000"
         self.HIGHLIGHT_SQUARES_COLOR_LIGHT = "#ee0000"
+        self.ATTACK_OVERLAY_WHITE_COLOR = np.array([0, 90, 255])
+        self.ATTACK_OVERLAY_BLACK_COLOR = np.array([255, 40, 0])
+        self.ATTACK_OVERLAY_ALPHA = 150
+        self.ATTACK_OVERLAY_MAX_ATTACKERS = 4
+        self.HANGING_PIECE_COLOR = (255, 0, 0)
+        self.PINNED_PIECE_COLOR = (255, 200, 0)
+        self.ATTACK_OVERLAY_MARKER_THICKNESS = max(1, roundint((self.RESOLUTION - 2 * self.OFFSET) / 200))
 
         self._dragging_piece_square = None
         self.board = chess.Board()
@@ -241,6 +333,9 @@ class ChessGUI:
         self.white_engine = None
         self.black_engine = None
         self._last_thread = None
+        self.show_attack_overlay = False
+        self.attack_overlay_blit = None
+        self._attack_overlay_key = None
 
         self.generate_blits()
 
@@ -305,6 +400,40 @@ class ChessGUI:
             arrows = self.arrows,
             fill = self.highlight_squares_dict,
         )
+        self.update_attack_overlay_blit()
+
+    def update_attack_overlay_blit(self):
+        if not self.show_attack_overlay:
+            return
+        board = self.board
+        key = (board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK], board.pawns, board.knights, board.bishops, board.rooks, board.queens, board.kings, self.ORIENTATION)
+        if key == self._attack_overlay_key:
+            return
+        counts, hanging, pinned = attack_maps(board)
+
+        # Rows of the grids run from the top of the screen, columns from the left
+        def to_screen(array):
+            grid = array.reshape(8, 8)
+            return grid[::-1] if self.ORIENTATION else grid[:, ::-1]
+
+        white_counts, black_counts = to_screen(counts[1]), to_screen(counts[0])
+        total = white_counts + black_counts
+        white_share = np.true_divide(white_counts, np.maximum(total, 1))[..., None]
+        rgba = np.zeros((8, 8, 4), dtype = np.uint8)
+        rgba[..., :3] = (white_share * self.ATTACK_OVERLAY_WHITE_COLOR + (1 - white_share) * self.ATTACK_OVERLAY_BLACK_COLOR).round()
+        rgba[..., 3] = (np.minimum(total, self.ATTACK_OVERLAY_MAX_ATTACKERS) / self.ATTACK_OVERLAY_MAX_ATTACKERS * self.ATTACK_OVERLAY_ALPHA).round()
+
+        board_size = roundint(self.RESOLUTION - 2 * self.OFFSET)
+        overlay = pygame.transform.scale(pygame.image.frombuffer(rgba.tobytes(), (8, 8), "RGBA"), (board_size, board_size))
+
+        square_size = board_size / 8
+        for mask, color, inset in ((hanging, self.HANGING_PIECE_COLOR, 0), (pinned, self.PINNED_PIECE_COLOR, 2 * self.ATTACK_OVERLAY_MARKER_THICKNESS)):
+            for row, col in zip(*np.nonzero(to_screen(mask))):
+                rect = pygame.Rect(roundint(col * square_size) + inset, roundint(row * square_size) + inset, roundint(square_size) - 2 * inset, roundint(square_size) - 2 * inset)
+                pygame.draw.rect(overlay, color, rect, self.ATTACK_OVERLAY_MARKER_THICKNESS)
+
+        self.attack_overlay_blit = overlay
+        self._attack_overlay_key = key
 
     def push(self, move: chess.Move, force_push = False):
         if self.engine_is_thinking() and not force_push:
@@ -358,6 +487,8 @@ class ChessGUI:
 
     def render_board(self):
         self.screen.blit(self.board_blit, (0, 0))
+        if self.show_attack_overlay and self.attack_overlay_blit is not None:
+            self.screen.blit(self.attack_overlay_blit, (self.OFFSET, self.OFFSET))
         xs = np.linspace(self.OFFSET, self.RESOLUTION - self.OFFSET, 9)[:-1]
         ys = np.linspace(self.OFFSET, self.RESOLUTION - self.OFFSET, 9)[:-1]
         dragging_piece_blit = None
@@ -492,6 +623,9 @@ class ChessGUI:
             elif event.key == pygame.K_f:
                 self.event_handler.f_key_down()
 
+            elif event.key == pygame.K_h:
+                self.event_handler.h_key_down()
+
             elif event.key == pygame.K_SPACE:
                 if self.engine_is_thinking():
                     return